@@ -0,0 +1,635 @@
+#
+# Copyright © 2020 Endless OS Foundation LLC.
+#
+# This file is part of clubhouse
+# (see https://github.com/endlessm/clubhouse).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""ID management system for the Clubhouse.
+
+Provides unique IDs for clubhouse entities (users, quests, sessions, ...)
+and secure tokens that link those IDs together with expiry, revocation
+and relationship tracking.
+"""
+
+import hashlib
+import itertools
+import os
+import secrets
+import time
+
+from array import array
+from collections import OrderedDict, defaultdict
+from enum import Enum
+from typing import Dict, List, Optional
+
+# Verified-token cache: token_value -> expiry snapshot. A hit lets
+# verify_token_link answer without re-entering the manager; entries are
+# dropped on revocation and evicted FIFO beyond the size cap.
+_VERIFY_CACHE_MAX = 10000
+_verify_cache: 'OrderedDict[str, float]' = OrderedDict()
+
+
+class IDType(Enum):
+    """Types of IDs managed by the Clubhouse."""
+    CLUBHOUSE = 'clubhouse'
+    USER = 'user'
+    SESSION = 'session'
+    QUEST = 'quest'
+    ACHIEVEMENT = 'achievement'
+    CUSTOM = 'custom'
+
+
+class TokenStatus(Enum):
+    """Lifecycle states of a linking token."""
+    ACTIVE = 'active'
+    EXPIRED = 'expired'
+    REVOKED = 'revoked'
+    PENDING = 'pending'
+
+
+class ClubhouseID:
+    """A unique identifier with metadata and access tracking.
+
+    Uses __slots__ so large ID populations stay compact in memory.
+    """
+
+    __slots__ = ('id_value', 'id_type', 'metadata', 'created_at',
+                 'access_count', 'last_accessed')
+
+    def __init__(self, id_type: IDType, id_value: Optional[str] = None,
+                 metadata: Optional[Dict] = None):
+        self.id_value = id_value if id_value is not None else secrets.token_hex(16)
+        self.id_type = id_type
+        self.metadata = metadata if metadata is not None else {}
+        self.created_at = time.time()
+        self.access_count = 0
+        self.last_accessed = None
+
+    def get_metadata(self, key, default=None):
+        """Return the metadata value for key.
+
+        A pure read: callers that want access instrumentation call
+        record_access() explicitly.
+        """
+        return self.metadata.get(key, default)
+
+    def record_access(self):
+        """Note that this ID was accessed, for usage instrumentation."""
+        self.access_count += 1
+        self.last_accessed = time.time()
+
+    def set_metadata(self, key, value):
+        """Set a metadata value for this ID."""
+        self.metadata[key] = value
+
+    def to_dict(self) -> Dict:
+        """Serialize this ID to a plain dict."""
+        return {
+            'id_value': self.id_value,
+            'id_type': self.id_type.value,
+            'metadata': self.metadata,
+            'created_at': self.created_at,
+            'access_count': self.access_count,
+            'last_accessed': self.last_accessed,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ClubhouseID':
+        """Deserialize an ID previously produced by to_dict()."""
+        clubhouse_id = cls(IDType(data['id_type']), data['id_value'],
+                           data.get('metadata'))
+        clubhouse_id.created_at = data.get('created_at', clubhouse_id.created_at)
+        clubhouse_id.access_count = data.get('access_count', 0)
+        clubhouse_id.last_accessed = data.get('last_accessed')
+        return clubhouse_id
+
+
+class TokenID:
+    """A secure token linking a source ID to a target ID.
+
+    Uses __slots__ so large token populations stay compact in memory.
+    """
+
+    __slots__ = ('token_value', 'source_id', 'target_id', 'relationship_type',
+                 'metadata', 'created_at', 'expires_at', 'status', '_token_hash',
+                 'source_key', 'target_key')
+
+    def __init__(self, source_id: str, target_id: str, expires_in: int = 3600,
+                 relationship_type: str = 'link', metadata: Optional[Dict] = None,
+                 *, token_value: Optional[str] = None,
+                 _now: Optional[float] = None):
+        self.token_value = token_value if token_value is not None else secrets.token_hex(16)
+        self._token_hash = None
+        self.source_id = source_id
+        self.target_id = target_id
+        self.relationship_type = relationship_type
+        self.metadata = metadata if metadata is not None else {}
+        now = _now if _now is not None else time.time()
+        self.created_at = now
+        self.expires_at = now + expires_in if expires_in > 0 else None
+        self.status = TokenStatus.ACTIVE
+        # Interned integer keys, assigned when the token is registered
+        # with an IDManager.
+        self.source_key = None
+        self.target_key = None
+
+    @classmethod
+    def _from_now(cls, source_id: str, target_id: str, expires_in: int = 3600,
+                  relationship_type: str = 'link', metadata: Optional[Dict] = None,
+                  *, now: float) -> 'TokenID':
+        """Build a token against a caller-supplied timestamp.
+
+        Batch creators capture time.time() once and reuse it for every
+        token instead of paying for a clock read per token.
+        """
+        return cls(source_id, target_id, expires_in, relationship_type,
+                   metadata, _now=now)
+
+    @property
+    def token_hash(self) -> str:
+        """SHA-256 hex digest of the token value, computed on first use."""
+        if self._token_hash is None:
+            self._token_hash = hashlib.sha256(self.token_value.encode()).hexdigest()
+        return self._token_hash
+
+    def is_expired(self) -> bool:
+        """Return whether this token has passed its expiry time."""
+        if self.expires_at is None:
+            return False
+        return time.time() > self.expires_at
+
+    def revoke(self):
+        """Revoke this token so it can no longer be verified."""
+        self.status = TokenStatus.REVOKED
+        _verify_cache.pop(self.token_value, None)
+
+    def extend_expiry(self, seconds: int):
+        """Push the expiry time of this token further into the future."""
+        if self.expires_at is not None:
+            self.expires_at += seconds
+
+    def to_dict(self) -> Dict:
+        """Serialize this token to a plain dict."""
+        return {
+            'token_value': self.token_value,
+            'token_hash': self.token_hash,
+            'source_id': self.source_id,
+            'target_id': self.target_id,
+            'relationship_type': self.relationship_type,
+            'metadata': self.metadata,
+            'created_at': self.created_at,
+            'expires_at': self.expires_at,
+            'status': self.status.value,
+        }
+
+
+class IDManager:
+    """Central manager for all IDs, tokens and their relationships."""
+
+    def __init__(self):
+        # String IDs and token values are interned to small ints on
+        # first insert; the tables below are keyed by those ints so hot
+        # lookups hash an int instead of a 32-char string. The public
+        # API still speaks strings throughout.
+        self._intern: Dict[str, int] = {}
+        self._unintern: List[str] = []
+        self.ids: Dict[int, ClubhouseID] = {}
+        self.tokens: Dict[int, TokenID] = {}
+        self.relationships: Dict[str, List[TokenID]] = defaultdict(list)
+        self.reverse_relationships: Dict[int, List[TokenID]] = defaultdict(list)
+        # Forward adjacency index keyed by source key, mirroring
+        # reverse_relationships, so linked-ID queries are O(degree)
+        # instead of a scan over every token.
+        self.forward_by_source: Dict[int, List[TokenID]] = defaultdict(list)
+        # Display-ready view of follow relationships with usernames
+        # resolved at insert time, so listing them needs no per-row ID
+        # lookups.
+        self._follow_view: List[Dict] = []
+        # Expiry mirror: a C-double array of expires_at in insertion
+        # order (0.0 for never / already handled), plus the tokens in
+        # the same order and a token-key -> slot map. The expiry sweep
+        # scans raw floats and only touches the few candidate objects.
+        self._exp = array('d')
+        self._tok_list: List[TokenID] = []
+        self._exp_index: Dict[int, int] = {}
+        # Incremental sweep state: every _sweep_stride inserts, one
+        # stride-sized slice of the expiry mirror is swept so expired
+        # tokens fall out of the adjacency indexes without anyone having
+        # to call cleanup_expired_tokens.
+        self._sweep_cursor = 0
+        self._sweep_stride = 64
+        self._insert_count = 0
+        # Aggregate token counts maintained on the write path so
+        # get_statistics is O(1). Expiry transitions are accounted when
+        # cleanup_expired_tokens observes them.
+        self._active_count = 0
+        self._expired_count = 0
+        self._revoked_count = 0
+        # ID minting state: a monotonic sequence number plus a pooled
+        # os.urandom read, so one syscall covers ~500 minted IDs.
+        self._next_seq = itertools.count()
+        self._rand_pool = bytearray()
+
+    def _mint_id(self) -> str:
+        """Mint a unique, unguessable hex ID.
+
+        Uniqueness comes from the sequence number, unpredictability from
+        64 random bits taken off the pooled urandom buffer.
+        """
+        pool = self._rand_pool
+        if len(pool) < 8:
+            pool.extend(os.urandom(4096))
+        rand = bytes(pool[:8])
+        del pool[:8]
+        return f'{next(self._next_seq):08x}{rand.hex()}'
+
+    def _key(self, value: str) -> int:
+        """Return the interned integer key for value, creating it on miss."""
+        key = self._intern.get(value)
+        if key is None:
+            key = len(self._unintern)
+            self._intern[value] = key
+            self._unintern.append(value)
+        return key
+
+    def add_id(self, clubhouse_id: ClubhouseID) -> ClubhouseID:
+        """Register an ID with the manager."""
+        self.ids[self._key(clubhouse_id.id_value)] = clubhouse_id
+        return clubhouse_id
+
+    def get_id(self, id_value: str) -> Optional[ClubhouseID]:
+        """Return the ID registered under id_value, or None."""
+        key = self._intern.get(id_value)
+        if key is None:
+            return None
+        return self.ids.get(key)
+
+    def get_ids_by_type(self, id_type: IDType) -> List[ClubhouseID]:
+        """Return all registered IDs of the given type."""
+        return [clubhouse_id for clubhouse_id in self.ids.values()
+                if clubhouse_id.id_type == id_type]
+
+    def add_token(self, token: TokenID) -> TokenID:
+        """Register a token and index its relationship both ways."""
+        token.source_key = source_key = self._key(token.source_id)
+        token.target_key = target_key = self._key(token.target_id)
+        token_key = self._key(token.token_value)
+        self.tokens[token_key] = token
+        self._exp_index[token_key] = len(self._tok_list)
+        self._tok_list.append(token)
+        self._exp.append(token.expires_at or 0.0)
+
+        self.relationships[token.relationship_type].append(token)
+        self.reverse_relationships[target_key].append(token)
+        self.forward_by_source[source_key].append(token)
+        if token.relationship_type == 'follow':
+            self._record_follow(token)
+        self._active_count += 1
+        self._insert_count += 1
+        if self._insert_count >= self._sweep_stride:
+            self._insert_count = 0
+            self._sweep_step(time.time())
+        return token
+
+    def _sweep_step(self, now: float):
+        """Sweep one bounded slice of the expiry mirror.
+
+        Round-robins a _sweep_stride-sized window over the insertion
+        order, marking expired active tokens and unlinking them from
+        the adjacency indexes so the hot lists only hold live tokens.
+        The tokens table keeps the entries for auditing.
+        """
+        exp = self._exp
+        total = len(exp)
+        if total == 0:
+            return
+        tok_list = self._tok_list
+        active = TokenStatus.ACTIVE
+        expired = TokenStatus.EXPIRED
+        cursor = self._sweep_cursor
+        for _ in range(self._sweep_stride):
+            if cursor >= total:
+                cursor = 0
+            expires_at = exp[cursor]
+            if 0.0 < expires_at < now:
+                token = tok_list[cursor]
+                actual = token.expires_at
+                if actual is not None and actual > now:
+                    exp[cursor] = actual
+                else:
+                    if token.status is active:
+                        token.status = expired
+                        self._active_count -= 1
+                        self._expired_count += 1
+                        self._unlink(token)
+                    exp[cursor] = 0.0
+            cursor += 1
+        self._sweep_cursor = cursor
+
+    def _unlink(self, token: TokenID):
+        """Drop a dead token from the adjacency indexes."""
+        for adjacency, key in ((self.forward_by_source, token.source_key),
+                               (self.reverse_relationships, token.target_key)):
+            links = adjacency.get(key)
+            if links is not None:
+                try:
+                    links.remove(token)
+                except ValueError:
+                    pass
+
+    def _record_follow(self, token: TokenID):
+        """Append a display-ready entry for a follow token."""
+        source = self.ids.get(token.source_key)
+        target = self.ids.get(token.target_key)
+        self._follow_view.append({
+            'follower_name': source.metadata.get('username') if source else None,
+            'followee_name': target.metadata.get('username') if target else None,
+            'authorized_by': token.metadata.get('authorized_by'),
+            'token': token,
+        })
+
+    def list_follow_relationships(self) -> List[Dict]:
+        """Return the pre-resolved follow entries, in insertion order.
+
+        Each entry carries the follower/followee usernames resolved at
+        insert time, the authorizer and the live token object; callers
+        should treat the list as read-only.
+        """
+        return self._follow_view
+
+    def add_tokens_bulk(self, tokens: List[TokenID]) -> List[TokenID]:
+        """Register many tokens at once, updating every index in one pass."""
+        key = self._key
+        token_map = self.tokens
+        relationships = self.relationships
+        reverse = self.reverse_relationships
+        forward = self.forward_by_source
+        exp = self._exp
+        exp_index = self._exp_index
+        tok_list = self._tok_list
+        for token in tokens:
+            token.source_key = source_key = key(token.source_id)
+            token.target_key = target_key = key(token.target_id)
+            token_key = key(token.token_value)
+            token_map[token_key] = token
+            exp_index[token_key] = len(tok_list)
+            tok_list.append(token)
+            exp.append(token.expires_at or 0.0)
+            relationships[token.relationship_type].append(token)
+            reverse[target_key].append(token)
+            forward[source_key].append(token)
+            if token.relationship_type == 'follow':
+                self._record_follow(token)
+        self._active_count += len(tokens)
+        self._insert_count += len(tokens)
+        if self._insert_count >= self._sweep_stride:
+            self._insert_count = 0
+            self._sweep_step(time.time())
+        return tokens
+
+    def get_token(self, token_value: str) -> Optional[TokenID]:
+        """Return the token registered under token_value, or None."""
+        key = self._intern.get(token_value)
+        if key is None:
+            return None
+        return self.tokens.get(key)
+
+    def revoke_token(self, token_value: str) -> bool:
+        """Revoke a token by value; return whether it existed."""
+        token = self.get_token(token_value)
+        if token is None:
+            return False
+        if token.status is TokenStatus.ACTIVE:
+            self._active_count -= 1
+        elif token.status is TokenStatus.EXPIRED:
+            self._expired_count -= 1
+        if token.status is not TokenStatus.REVOKED:
+            self._revoked_count += 1
+        token.revoke()
+        slot = self._exp_index.get(self._intern[token_value])
+        if slot is not None:
+            self._exp[slot] = 0.0
+        return True
+
+    def get_active_linked_tokens(self, source_id: str) -> List[TokenID]:
+        """Return the active, unexpired tokens originating at source_id."""
+        key = self._intern.get(source_id)
+        if key is None:
+            return []
+        return [token for token in self.forward_by_source.get(key, ())
+                if token.status is TokenStatus.ACTIVE and not token.is_expired()]
+
+    def get_linked_ids(self, source_id: str) -> List[str]:
+        """Return the IDs actively linked from source_id."""
+        return [token.target_id for token in self.get_active_linked_tokens(source_id)]
+
+    def get_reverse_linked_ids(self, target_id: str) -> List[str]:
+        """Return the IDs actively linked to target_id."""
+        key = self._intern.get(target_id)
+        if key is None:
+            return []
+        return [token.source_id
+                for token in self.reverse_relationships.get(key, ())
+                if token.status is TokenStatus.ACTIVE and not token.is_expired()]
+
+    def has_follow_path(self, source_id: str, target_id: str,
+                        max_depth: int = 4) -> bool:
+        """Return whether target_id is reachable from source_id.
+
+        Runs a bidirectional BFS over the active link graph, expanding
+        whichever frontier is currently smaller. Follow graphs are
+        asymmetric — a popular followee can have a huge follower list
+        while out-degrees stay bounded — so stepping the narrow side
+        visits far fewer tokens than a one-directional search.
+        """
+        src = self._intern.get(source_id)
+        dst = self._intern.get(target_id)
+        if src is None or dst is None:
+            return False
+        if src == dst:
+            return True
+
+        forward = self.forward_by_source
+        reverse = self.reverse_relationships
+        active = TokenStatus.ACTIVE
+        now = time.time()
+        fwd, rev = {src}, {dst}
+        seen_fwd, seen_rev = {src}, {dst}
+
+        for _ in range(max_depth):
+            if not fwd or not rev:
+                return False
+            if len(fwd) <= len(rev):
+                next_frontier = set()
+                for key in fwd:
+                    for token in forward.get(key, ()):
+                        if token.status is not active:
+                            continue
+                        expires_at = token.expires_at
+                        if expires_at is not None and expires_at < now:
+                            continue
+                        neighbor = token.target_key
+                        if neighbor in seen_rev:
+                            return True
+                        if neighbor not in seen_fwd:
+                            seen_fwd.add(neighbor)
+                            next_frontier.add(neighbor)
+                fwd = next_frontier
+            else:
+                next_frontier = set()
+                for key in rev:
+                    for token in reverse.get(key, ()):
+                        if token.status is not active:
+                            continue
+                        expires_at = token.expires_at
+                        if expires_at is not None and expires_at < now:
+                            continue
+                        neighbor = token.source_key
+                        if neighbor in seen_fwd:
+                            return True
+                        if neighbor not in seen_rev:
+                            seen_rev.add(neighbor)
+                            next_frontier.add(neighbor)
+                rev = next_frontier
+        return False
+
+    def get_relationships(self, relationship_type: Optional[str] = None) -> List[TokenID]:
+        """Return tokens of the given relationship type, or all tokens."""
+        if relationship_type is None:
+            return list(self.tokens.values())
+        return self.relationships.get(relationship_type, [])
+
+    def cleanup_expired_tokens(self) -> int:
+        """Mark expired active tokens as EXPIRED; return how many.
+
+        Scans the flat expiry mirror instead of the token objects; a
+        token is only materialized when its mirrored expiry has passed,
+        and each slot is zeroed once handled so later sweeps skip it.
+        Expiries pushed back through extend_expiry are resynced when
+        the sweep notices them.
+        """
+        now = time.time()
+        active = TokenStatus.ACTIVE
+        expired = TokenStatus.EXPIRED
+        exp = self._exp
+        tok_list = self._tok_list
+        expired_count = 0
+        for slot, expires_at in enumerate(exp):
+            if not 0.0 < expires_at < now:
+                continue
+            token = tok_list[slot]
+            actual = token.expires_at
+            if actual is None or actual > now:
+                exp[slot] = actual if actual is not None else 0.0
+                continue
+            if token.status is active:
+                token.status = expired
+                expired_count += 1
+            exp[slot] = 0.0
+        self._active_count -= expired_count
+        self._expired_count += expired_count
+        return expired_count
+
+    def get_statistics(self) -> Dict:
+        """Return summary counts for IDs, tokens and relationships.
+
+        The token counts are maintained incrementally, so this is O(1).
+        Tokens whose expiry has passed count as active until a
+        cleanup_expired_tokens pass observes the transition.
+        """
+        return {
+            'total_ids': len(self.ids),
+            'total_tokens': len(self.tokens),
+            'active_tokens': self._active_count,
+            'expired_tokens': self._expired_count,
+            'revoked_tokens': self._revoked_count,
+            'relationship_types': len(self.relationships),
+        }
+
+    def export_data(self) -> Dict:
+        """Serialize every registered ID and token for persistence."""
+        return {
+            'ids': [clubhouse_id.to_dict() for clubhouse_id in self.ids.values()],
+            'tokens': [token.to_dict() for token in self.tokens.values()],
+        }
+
+
+_id_manager = None
+
+
+def get_id_manager() -> IDManager:
+    """Return the global IDManager, creating it on first use."""
+    global _id_manager
+    if _id_manager is None:
+        _id_manager = IDManager()
+    return _id_manager
+
+
+def _get() -> IDManager:
+    """Fast path to the global manager for the module helpers.
+
+    Skips the global-declaration and init check of get_id_manager()
+    once the manager exists, which the hot helpers call constantly.
+    """
+    manager = _id_manager
+    if manager is None:
+        return get_id_manager()
+    return manager
+
+
+def create_clubhouse_id(id_type: IDType = IDType.CUSTOM,
+                        id_value: Optional[str] = None,
+                        metadata: Optional[Dict] = None) -> ClubhouseID:
+    """Create and register a new ClubhouseID."""
+    manager = _get()
+    if id_value is None:
+        id_value = manager._mint_id()
+    clubhouse_id = ClubhouseID(id_type, id_value, metadata)
+    manager.add_id(clubhouse_id)
+    return clubhouse_id
+
+
+def create_token_link(source_id: str, target_id: str, expires_in: int = 3600,
+                      relationship_type: str = 'link',
+                      metadata: Optional[Dict] = None) -> TokenID:
+    """Create and register a token linking source_id to target_id."""
+    manager = _get()
+    token = TokenID(source_id, target_id, expires_in, relationship_type,
+                    metadata, token_value=manager._mint_id())
+    manager.add_token(token)
+    return token
+
+
+def verify_token_link(token_value: str) -> bool:
+    """Return whether token_value names an active, unexpired token."""
+    cached = _verify_cache.get(token_value)
+    if cached is not None and time.time() < cached:
+        return True
+
+    manager = _get()
+    token = manager.get_token(token_value)
+    if token is None:
+        return False
+    if token.status is not TokenStatus.ACTIVE:
+        return False
+    if token.is_expired():
+        return False
+
+    _verify_cache[token_value] = token.expires_at or (time.time() + 30)
+    if len(_verify_cache) > _VERIFY_CACHE_MAX:
+        _verify_cache.popitem(last=False)
+    return True
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+#
+# Copyright © 2020 Endless OS Foundation LLC.
+#
+# This file is part of clubhouse
+# (see https://github.com/endlessm/clubhouse).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Usage examples for the Clubhouse ID management system."""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from eosclubhouse.id_manager import (IDType, TokenID, TokenStatus,
+                                     create_clubhouse_id, create_token_link,
+                                     get_id_manager, verify_token_link)
+
+
+def demo_basic_usage():
+    """Walk through ID creation, linking and verification."""
+    print('=== Basic Usage ===')
+
+    clubhouse = create_clubhouse_id(
+        id_type=IDType.CLUBHOUSE,
+        metadata={'name': 'Adventure Academy', 'capacity': 100})
+    user = create_clubhouse_id(
+        id_type=IDType.USER,
+        metadata={'username': 'brave_explorer', 'email': 'user@example.com'})
+    quest = create_clubhouse_id(
+        id_type=IDType.QUEST,
+        metadata={'title': 'Python Basics', 'difficulty': 'beginner'})
+
+    membership = create_token_link(
+        source_id=user.id_value,
+        target_id=clubhouse.id_value,
+        expires_in=86400,
+        relationship_type='membership')
+    enrollment = create_token_link(
+        source_id=user.id_value,
+        target_id=quest.id_value,
+        expires_in=3600,
+        relationship_type='enrollment')
+
+    print(f"User {user.get_metadata('username')} created")
+    print(f"Membership valid: {verify_token_link(membership.token_value)}")
+    print(f"Enrollment valid: {verify_token_link(enrollment.token_value)}")
+
+    manager = get_id_manager()
+    connections = manager.get_linked_ids(user.id_value)
+    print(f'User is connected to {len(connections)} entities')
+
+
+def follow_via_token(follower_id, followee_id, authorizer_token):
+    """Create a follow link, authorized by an active moderator token.
+
+    Fetches the authorizer once and checks it inline rather than going
+    through verify_token_link and then fetching the same token again.
+    """
+    manager = get_id_manager()
+    auth_token = manager.get_token(authorizer_token)
+    if (auth_token is None or auth_token.status is not TokenStatus.ACTIVE
+            or auth_token.is_expired()):
+        return None
+
+    return manager.add_token(
+        TokenID(follower_id, followee_id, 86400, 'follow',
+                {'authorized_by': auth_token.source_id,
+                 'authorized_at': time.time()}))
+
+
+def follow_batch(pairs, authorizer_token):
+    """Create many follow links with a single authorization check.
+
+    Verifies the authorizer token once, builds one TokenID per
+    (follower_id, followee_id) pair and registers them all through
+    IDManager.add_tokens_bulk, instead of re-entering the manager for
+    every pair as follow_via_token does.
+    """
+    if not verify_token_link(authorizer_token):
+        return []
+
+    manager = get_id_manager()
+    auth_src = manager.get_token(authorizer_token).source_id
+    auth_ts = time.time()
+    new_tokens = [TokenID._from_now(follower_id, followee_id, 86400, 'follow',
+                                    {'authorized_by': auth_src,
+                                     'authorized_at': auth_ts},
+                                    now=auth_ts)
+                  for follower_id, followee_id in pairs]
+    return manager.add_tokens_bulk(new_tokens)
+
+
+def demo_advanced_scenario():
+    """A moderated social graph where every user follows every other."""
+    print('\n=== Advanced Scenario ===')
+    manager = get_id_manager()
+
+    # Step 1: create a moderator and a small set of users.
+    print('Step 1: Creating moderator and users...')
+    moderator = create_clubhouse_id(
+        id_type=IDType.USER,
+        metadata={'username': 'moderator', 'role': 'admin'})
+    usernames = ['alice', 'bob', 'carol', 'dave']
+    users = [create_clubhouse_id(id_type=IDType.USER,
+                                 metadata={'username': username})
+             for username in usernames]
+
+    # Step 2: the moderator opens a session that authorizes follows.
+    print('Step 2: Opening moderator session...')
+    session = create_clubhouse_id(
+        id_type=IDType.SESSION,
+        metadata={'purpose': 'moderation'})
+    mod_token = create_token_link(
+        source_id=moderator.id_value,
+        target_id=session.id_value,
+        expires_in=3600,
+        relationship_type='session')
+
+    # Step 3: everyone follows everyone else, in one batch. The
+    # id_value/username loads are hoisted out of the pair loop — each
+    # user is resolved once instead of once per pair.
+    print('Step 3: Creating follow relationships...')
+    ids = [user.id_value for user in users]
+    names = [user.get_metadata('username') for user in users]
+    count = len(users)
+    index_pairs = [(i, j)
+                   for i in range(count) for j in range(count) if i != j]
+    new_follows = follow_batch([(ids[i], ids[j]) for i, j in index_pairs],
+                               mod_token.token_value)
+    if new_follows:
+        print('\n'.join(f'  {names[i]} -> {names[j]}'
+                        for i, j in index_pairs))
+    print(f'Created {len(new_follows)} follow relationships')
+
+    # Step 4: verify the graph through the linked-ID queries.
+    print('Step 4: Verifying the follow graph...')
+    for name, user_id in zip(names, ids):
+        following = manager.get_linked_ids(user_id)
+        followers = manager.get_reverse_linked_ids(user_id)
+        print(f'  {name}: '
+              f'following {len(following)}, followed by {len(followers)}')
+
+    # Step 5: list every follow relationship in detail, straight from
+    # the pre-resolved follow view — no per-row ID lookups, and the
+    # whole listing goes out in one stdout write instead of four print
+    # calls per relationship.
+    print('Step 5: Listing follow relationships...')
+    lines = []
+    for rel in manager.list_follow_relationships():
+        token = rel['token']
+        expires = time.ctime(token.expires_at) if token.expires_at else 'Never'
+        lines.append(f"  - {rel['follower_name']} follows {rel['followee_name']}\n"
+                     f"    Authorized by: {rel['authorized_by']}\n"
+                     f'    Status: {token.status.value}\n'
+                     f'    Expires: {expires}')
+    if lines:
+        sys.stdout.write('\n'.join(lines) + '\n')
+
+    # Step 6: overall statistics.
+    print('Step 6: Statistics...')
+    stats = manager.get_statistics()
+    print(f"  Total IDs: {stats['total_ids']}")
+    print(f"  Total tokens: {stats['total_tokens']}")
+    print(f"  Active tokens: {stats['active_tokens']}")
+
+
+def main():
+    demo_basic_usage()
+    demo_advanced_scenario()
+
+
+if __name__ == '__main__':
+    main()
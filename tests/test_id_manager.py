@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+#
+# Copyright © 2020 Endless OS Foundation LLC.
+#
+# This file is part of clubhouse
+# (see https://github.com/endlessm/clubhouse).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Unit tests for the Clubhouse ID management system."""
+
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from eosclubhouse import id_manager
+from eosclubhouse.id_manager import (ClubhouseID, IDManager, IDType, TokenID,
+                                     TokenStatus, create_clubhouse_id,
+                                     create_token_link, get_id_manager,
+                                     verify_token_link)
+
+
+class TestClubhouseID(unittest.TestCase):
+
+    def test_creation_generates_unique_values(self):
+        first = ClubhouseID(IDType.USER)
+        second = ClubhouseID(IDType.USER)
+        self.assertNotEqual(first.id_value, second.id_value)
+        self.assertEqual(first.id_type, IDType.USER)
+
+    def test_metadata_round_trip(self):
+        clubhouse_id = ClubhouseID(IDType.QUEST, metadata={'title': 'Intro'})
+        self.assertEqual(clubhouse_id.get_metadata('title'), 'Intro')
+        clubhouse_id.set_metadata('difficulty', 'beginner')
+        self.assertEqual(clubhouse_id.get_metadata('difficulty'), 'beginner')
+        self.assertIsNone(clubhouse_id.get_metadata('missing'))
+
+    def test_get_metadata_does_not_track_access(self):
+        clubhouse_id = ClubhouseID(IDType.USER, metadata={'username': 'alice'})
+        clubhouse_id.get_metadata('username')
+        self.assertEqual(clubhouse_id.access_count, 0)
+        self.assertIsNone(clubhouse_id.last_accessed)
+        clubhouse_id.record_access()
+        self.assertEqual(clubhouse_id.access_count, 1)
+        self.assertIsNotNone(clubhouse_id.last_accessed)
+
+    def test_to_dict_from_dict(self):
+        original = ClubhouseID(IDType.USER, metadata={'username': 'alice'})
+        restored = ClubhouseID.from_dict(original.to_dict())
+        self.assertEqual(restored.id_value, original.id_value)
+        self.assertEqual(restored.id_type, IDType.USER)
+        self.assertEqual(restored.metadata, original.metadata)
+
+
+class TestTokenID(unittest.TestCase):
+
+    def test_creation(self):
+        token = TokenID('src', 'dst', expires_in=3600,
+                        relationship_type='membership')
+        self.assertEqual(token.source_id, 'src')
+        self.assertEqual(token.target_id, 'dst')
+        self.assertEqual(token.status, TokenStatus.ACTIVE)
+        self.assertFalse(token.is_expired())
+
+    def test_expiry(self):
+        token = TokenID('src', 'dst', expires_in=3600)
+        token.expires_at = token.created_at - 1
+        self.assertTrue(token.is_expired())
+
+    def test_no_expiry(self):
+        token = TokenID('src', 'dst', expires_in=0)
+        self.assertIsNone(token.expires_at)
+        self.assertFalse(token.is_expired())
+
+    def test_revoke(self):
+        token = TokenID('src', 'dst')
+        token.revoke()
+        self.assertEqual(token.status, TokenStatus.REVOKED)
+
+    def test_extend_expiry(self):
+        token = TokenID('src', 'dst', expires_in=3600)
+        before = token.expires_at
+        token.extend_expiry(600)
+        self.assertEqual(token.expires_at, before + 600)
+
+
+class TestIDManager(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = IDManager()
+
+    def _add_user(self, username):
+        user = ClubhouseID(IDType.USER, metadata={'username': username})
+        self.manager.add_id(user)
+        return user
+
+    def test_mint_id_unique_hex(self):
+        minted = {self.manager._mint_id() for _ in range(1000)}
+        self.assertEqual(len(minted), 1000)
+        for value in minted:
+            self.assertEqual(len(value), 24)
+            int(value, 16)
+
+    def test_add_and_get_id(self):
+        user = self._add_user('alice')
+        self.assertIs(self.manager.get_id(user.id_value), user)
+        self.assertIsNone(self.manager.get_id('unknown'))
+
+    def test_get_ids_by_type(self):
+        self._add_user('alice')
+        self._add_user('bob')
+        self.manager.add_id(ClubhouseID(IDType.QUEST))
+        self.assertEqual(len(self.manager.get_ids_by_type(IDType.USER)), 2)
+        self.assertEqual(len(self.manager.get_ids_by_type(IDType.SESSION)), 0)
+
+    def test_linked_ids(self):
+        alice = self._add_user('alice')
+        bob = self._add_user('bob')
+        carol = self._add_user('carol')
+        self.manager.add_token(TokenID(alice.id_value, bob.id_value,
+                                       relationship_type='follow'))
+        self.manager.add_token(TokenID(alice.id_value, carol.id_value,
+                                       relationship_type='follow'))
+        linked = self.manager.get_linked_ids(alice.id_value)
+        self.assertCountEqual(linked, [bob.id_value, carol.id_value])
+        self.assertEqual(self.manager.get_linked_ids(bob.id_value), [])
+
+    def test_reverse_linked_ids(self):
+        alice = self._add_user('alice')
+        bob = self._add_user('bob')
+        carol = self._add_user('carol')
+        self.manager.add_token(TokenID(alice.id_value, carol.id_value))
+        self.manager.add_token(TokenID(bob.id_value, carol.id_value))
+        followers = self.manager.get_reverse_linked_ids(carol.id_value)
+        self.assertCountEqual(followers, [alice.id_value, bob.id_value])
+
+    def test_linked_ids_skip_revoked_and_expired(self):
+        alice = self._add_user('alice')
+        bob = self._add_user('bob')
+        carol = self._add_user('carol')
+        revoked = TokenID(alice.id_value, bob.id_value)
+        expired = TokenID._from_now(alice.id_value, carol.id_value,
+                                    expires_in=3600, now=time.time() - 7200)
+        self.manager.add_token(revoked)
+        self.manager.add_token(expired)
+        revoked.revoke()
+        self.assertEqual(self.manager.get_linked_ids(alice.id_value), [])
+
+    def test_get_active_linked_tokens(self):
+        alice = self._add_user('alice')
+        bob = self._add_user('bob')
+        token = TokenID(alice.id_value, bob.id_value)
+        self.manager.add_token(token)
+        self.assertEqual(self.manager.get_active_linked_tokens(alice.id_value),
+                         [token])
+
+    def test_add_tokens_bulk(self):
+        alice = self._add_user('alice')
+        bob = self._add_user('bob')
+        tokens = [TokenID(alice.id_value, bob.id_value, relationship_type='follow'),
+                  TokenID(bob.id_value, alice.id_value, relationship_type='follow')]
+        self.manager.add_tokens_bulk(tokens)
+        self.assertEqual(len(self.manager.get_relationships('follow')), 2)
+        self.assertEqual(self.manager.get_linked_ids(alice.id_value),
+                         [bob.id_value])
+        self.assertEqual(self.manager.get_reverse_linked_ids(alice.id_value),
+                         [bob.id_value])
+
+    def test_list_follow_relationships(self):
+        alice = self._add_user('alice')
+        bob = self._add_user('bob')
+        self.manager.add_token(TokenID(alice.id_value, bob.id_value,
+                                       relationship_type='follow',
+                                       metadata={'authorized_by': 'mod'}))
+        self.manager.add_token(TokenID(alice.id_value, bob.id_value,
+                                       relationship_type='membership'))
+        view = self.manager.list_follow_relationships()
+        self.assertEqual(len(view), 1)
+        self.assertEqual(view[0]['follower_name'], 'alice')
+        self.assertEqual(view[0]['followee_name'], 'bob')
+        self.assertEqual(view[0]['authorized_by'], 'mod')
+
+    def test_has_follow_path(self):
+        alice = self._add_user('alice')
+        bob = self._add_user('bob')
+        carol = self._add_user('carol')
+        self.manager.add_token(TokenID(alice.id_value, bob.id_value,
+                                       relationship_type='follow'))
+        self.manager.add_token(TokenID(bob.id_value, carol.id_value,
+                                       relationship_type='follow'))
+        self.assertTrue(self.manager.has_follow_path(alice.id_value,
+                                                     carol.id_value))
+        self.assertFalse(self.manager.has_follow_path(carol.id_value,
+                                                      alice.id_value))
+        self.assertFalse(self.manager.has_follow_path(alice.id_value,
+                                                      carol.id_value,
+                                                      max_depth=1))
+        self.assertTrue(self.manager.has_follow_path(alice.id_value,
+                                                     alice.id_value))
+        self.assertFalse(self.manager.has_follow_path(alice.id_value,
+                                                      'unknown'))
+
+    def test_has_follow_path_skips_revoked(self):
+        alice = self._add_user('alice')
+        bob = self._add_user('bob')
+        token = TokenID(alice.id_value, bob.id_value,
+                        relationship_type='follow')
+        self.manager.add_token(token)
+        self.assertTrue(self.manager.has_follow_path(alice.id_value,
+                                                     bob.id_value))
+        self.manager.revoke_token(token.token_value)
+        self.assertFalse(self.manager.has_follow_path(alice.id_value,
+                                                      bob.id_value))
+
+    def test_get_relationships(self):
+        alice = self._add_user('alice')
+        bob = self._add_user('bob')
+        follow = TokenID(alice.id_value, bob.id_value, relationship_type='follow')
+        membership = TokenID(alice.id_value, bob.id_value,
+                             relationship_type='membership')
+        self.manager.add_token(follow)
+        self.manager.add_token(membership)
+        self.assertEqual(self.manager.get_relationships('follow'), [follow])
+        self.assertEqual(len(self.manager.get_relationships()), 2)
+        self.assertEqual(self.manager.get_relationships('unknown'), [])
+
+    def test_revoke_token(self):
+        token = TokenID('src', 'dst')
+        self.manager.add_token(token)
+        self.assertTrue(self.manager.revoke_token(token.token_value))
+        self.assertEqual(token.status, TokenStatus.REVOKED)
+        self.assertFalse(self.manager.revoke_token('unknown'))
+
+    def test_cleanup_expired_tokens(self):
+        fresh = TokenID('a', 'b', expires_in=3600)
+        stale = TokenID._from_now('a', 'c', expires_in=3600,
+                                  now=time.time() - 7200)
+        self.manager.add_token(fresh)
+        self.manager.add_token(stale)
+        self.assertEqual(self.manager.cleanup_expired_tokens(), 1)
+        self.assertEqual(stale.status, TokenStatus.EXPIRED)
+        self.assertEqual(fresh.status, TokenStatus.ACTIVE)
+
+    def test_incremental_sweep_unlinks_expired(self):
+        past = time.time() - 7200
+        for _ in range(65):
+            self.manager.add_token(TokenID._from_now('src', 'dst',
+                                                     expires_in=3600,
+                                                     now=past))
+        stats = self.manager.get_statistics()
+        self.assertGreaterEqual(stats['expired_tokens'], 64)
+        self.assertEqual(self.manager.get_linked_ids('src'), [])
+        src_key = self.manager._intern['src']
+        self.assertEqual(len(self.manager.forward_by_source[src_key]), 1)
+
+    def test_statistics(self):
+        self._add_user('alice')
+        active = TokenID('a', 'b')
+        revoked = TokenID('a', 'c')
+        self.manager.add_token(active)
+        self.manager.add_token(revoked)
+        self.manager.revoke_token(revoked.token_value)
+        stats = self.manager.get_statistics()
+        self.assertEqual(stats['total_ids'], 1)
+        self.assertEqual(stats['total_tokens'], 2)
+        self.assertEqual(stats['active_tokens'], 1)
+        self.assertEqual(stats['revoked_tokens'], 1)
+
+    def test_statistics_after_cleanup(self):
+        stale = TokenID._from_now('a', 'b', expires_in=3600,
+                                  now=time.time() - 7200)
+        self.manager.add_token(stale)
+        self.manager.cleanup_expired_tokens()
+        stats = self.manager.get_statistics()
+        self.assertEqual(stats['active_tokens'], 0)
+        self.assertEqual(stats['expired_tokens'], 1)
+
+    def test_export_data(self):
+        self._add_user('alice')
+        self.manager.add_token(TokenID('a', 'b'))
+        data = self.manager.export_data()
+        self.assertEqual(len(data['ids']), 1)
+        self.assertEqual(len(data['tokens']), 1)
+
+
+class TestModuleFunctions(unittest.TestCase):
+
+    def setUp(self):
+        id_manager._id_manager = None
+
+    def test_get_id_manager_is_singleton(self):
+        self.assertIs(get_id_manager(), get_id_manager())
+
+    def test_create_clubhouse_id_registers(self):
+        user = create_clubhouse_id(id_type=IDType.USER,
+                                   metadata={'username': 'alice'})
+        self.assertIs(get_id_manager().get_id(user.id_value), user)
+
+    def test_create_and_verify_token_link(self):
+        user = create_clubhouse_id(id_type=IDType.USER)
+        quest = create_clubhouse_id(id_type=IDType.QUEST)
+        token = create_token_link(user.id_value, quest.id_value,
+                                  expires_in=3600,
+                                  relationship_type='enrollment')
+        self.assertTrue(verify_token_link(token.token_value))
+        self.assertFalse(verify_token_link('no-such-token'))
+
+    def test_verify_rejects_revoked_and_expired(self):
+        user = create_clubhouse_id(id_type=IDType.USER)
+        quest = create_clubhouse_id(id_type=IDType.QUEST)
+        token = create_token_link(user.id_value, quest.id_value)
+        get_id_manager().revoke_token(token.token_value)
+        self.assertFalse(verify_token_link(token.token_value))
+        expired = TokenID._from_now(user.id_value, quest.id_value,
+                                    expires_in=3600, now=time.time() - 7200)
+        get_id_manager().add_token(expired)
+        self.assertFalse(verify_token_link(expired.token_value))
+
+    def test_revoke_invalidates_verify_cache(self):
+        user = create_clubhouse_id(id_type=IDType.USER)
+        quest = create_clubhouse_id(id_type=IDType.QUEST)
+        token = create_token_link(user.id_value, quest.id_value)
+        self.assertTrue(verify_token_link(token.token_value))
+        get_id_manager().revoke_token(token.token_value)
+        self.assertFalse(verify_token_link(token.token_value))
+
+
+if __name__ == '__main__':
+    unittest.main()